@@ -0,0 +1,127 @@
+import logging
+import uuid
+
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad.openai_tools import (
+    format_to_openai_tool_messages,
+)
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_openai import ChatOpenAI
+
+from lib.metrics import MetricsRegistry
+from lib.profiling import profile
+from lib.tracing import TracingConfig, TurnTrace, trace_turn, write_trace_file
+from tools.aws.cost_explorer_tool import AwsCostExplorerTool
+from tools.aws.ec2_tool import AwsEc2Tool
+from tools.aws.iam_tool import AwsIamTool
+from tools.aws.s3_tool import AwsS3Tool
+from tools.callbacks import FORMAT_TOOL_OUTPUTS_RUN_NAME, TracingCallbackHandler
+from tools.common import AwsClientFactory
+
+_LOGGER = logging.getLogger(__name__)
+
+# Shared across chat sessions so the exported metrics cover the whole process.
+_METRICS_REGISTRY = MetricsRegistry()
+
+
+def parsing_error_handler(_: OutputParserException) -> str:
+    return "Apologies, an error was encountered when interpreting the input. Please attempt again, perhaps with a rephrased question."
+
+
+def set_up_agent_executor(
+    llm: BaseChatModel | None = None,
+    aws_client_factory: AwsClientFactory | None = None,
+) -> AgentExecutor:
+    if llm is None:
+        llm = ChatOpenAI(model="gpt-3.5-turbo-0125", temperature=0)
+    tools = [
+        AwsS3Tool(aws_client_factory=aws_client_factory),
+        AwsEc2Tool(aws_client_factory=aws_client_factory),
+        AwsIamTool(aws_client_factory=aws_client_factory),
+        AwsCostExplorerTool(aws_client_factory=aws_client_factory),
+    ]
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are a helpful assistant who has knowledge about a variety of AWS resources in an AWS account.",
+            ),
+            MessagesPlaceholder("chat_history", optional=True),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ]
+    )
+
+    # Equivalent to create_openai_tools_agent, except that the step which
+    # serializes tool outputs into the scratchpad is named, so it can be told
+    # apart from the other chain steps in traces.
+    format_tool_outputs = RunnableLambda(_format_tool_outputs).with_config(
+        run_name=FORMAT_TOOL_OUTPUTS_RUN_NAME
+    )
+    agent = (
+        RunnablePassthrough.assign(agent_scratchpad=format_tool_outputs)
+        | prompt
+        | llm.bind(tools=[convert_to_openai_tool(tool) for tool in tools])
+        | OpenAIToolsAgentOutputParser()
+    )
+
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=False,
+        handle_parsing_errors=parsing_error_handler,
+    )
+
+
+def _format_tool_outputs(agent_input: dict) -> list[BaseMessage]:
+    return format_to_openai_tool_messages(agent_input["intermediate_steps"])
+
+
+def invoke_agent(
+    agent_executor: AgentExecutor,
+    user_input: str,
+    tracing_config: TracingConfig | None = None,
+) -> dict:
+    if tracing_config is None:
+        return agent_executor.invoke({"input": user_input})
+
+    trace_id = uuid.uuid4().hex
+    trace: TurnTrace | None = None
+    try:
+        # The profiler is entered first and exited last, so writing its output
+        # is not counted in the turn's duration.
+        with profile(
+            tracing_config.profiler, tracing_config.profiles_dir / trace_id
+        ) as profile_path:
+            with trace_turn(question=user_input, trace_id=trace_id) as trace:
+                if profile_path is not None:
+                    trace.root.attributes["profile_path"] = str(profile_path)
+
+                return agent_executor.invoke(
+                    {"input": user_input},
+                    config={"callbacks": [TracingCallbackHandler(trace)]},
+                )
+    finally:
+        # Failed turns are exported too, since those are often the slow ones.
+        if trace is not None:
+            _export_trace(trace, tracing_config)
+
+
+def _export_trace(trace: TurnTrace, tracing_config: TracingConfig) -> None:
+    try:
+        trace_path = write_trace_file(trace, tracing_config.traces_dir)
+        _METRICS_REGISTRY.observe_trace(trace)
+        _METRICS_REGISTRY.write(tracing_config.metrics_path)
+    except OSError as e:
+        _LOGGER.warning(f"Error exporting trace {trace.trace_id}: {e}")
+        return
+
+    _LOGGER.info(
+        f"Turn trace {trace.trace_id} written to {trace_path}: {trace.summary()}"
+    )
@@ -0,0 +1,73 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+@dataclass
+class ScriptedToolCall:
+    tool_name: str
+    arguments: dict[str, Any]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Stands in for the OpenAI tools model with a fixed tool call per question.
+
+    The first response to a question is its scripted tool call, and once the
+    tool output is in the conversation the model replies with a final answer.
+    """
+
+    tool_calls_by_question: dict[str, ScriptedToolCall]
+    # Simulated model latency, so benchmarks can approximate a real LLM.
+    latency_seconds: float = 0.0
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(
+                content=f"Answered from {len(messages[-1].content)} characters of tool output."
+            )
+        else:
+            question = next(
+                message.content
+                for message in reversed(messages)
+                if isinstance(message, HumanMessage)
+            )
+            tool_call = self.tool_calls_by_question[question]
+            message = AIMessage(
+                content="",
+                additional_kwargs={
+                    "tool_calls": [
+                        {
+                            "id": "call_0",
+                            "type": "function",
+                            "function": {
+                                "name": tool_call.tool_name,
+                                "arguments": json.dumps(tool_call.arguments),
+                            },
+                        }
+                    ]
+                },
+            )
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
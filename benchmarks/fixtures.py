@@ -0,0 +1,467 @@
+import json
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO
+from typing import Any, Callable
+from xml.sax.saxutils import escape as xml_escape
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.client import BaseClient
+from botocore.response import StreamingBody
+from urllib3.response import HTTPResponse
+
+from lib.s3_helper import BYTES_PER_MB, SMALL_FILE_SIZE_THRESHOLD_MB
+
+COST_PERIOD_END_DATE = date(2024, 3, 1)
+
+_FIXTURE_REGION = "us-east-1"
+_CLIENT_PARAMS_CONTEXT_KEY = "benchmark_client_params"
+_FIXTURE_CREATION_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_COST_SERVICE_NAMES = [
+    "Amazon Simple Storage Service",
+    "Amazon Elastic Compute Cloud - Compute",
+    "EC2 - Other",
+    "AWS Lambda",
+    "Amazon Relational Database Service",
+    "Amazon CloudFront",
+    "Amazon DynamoDB",
+    "AmazonCloudWatch",
+    "AWS Key Management Service",
+    "Amazon Virtual Private Cloud",
+    "Amazon Route 53",
+    "AWS Cost Explorer",
+]
+
+
+@dataclass
+class FixtureScale:
+    bucket_count: int = 50
+    objects_per_bucket: int = 20
+    # Every n-th bucket has a public bucket policy.
+    public_bucket_interval: int = 10
+    object_size_bytes: int = 4 * 1024
+    instance_count: int = 100
+    instances_per_reservation: int = 2
+    group_count: int = 5
+    policies_per_principal: int = 5
+    cost_days: int = 30
+    seed: int = 0
+
+    @property
+    def cost_start_date(self) -> date:
+        return COST_PERIOD_END_DATE - timedelta(days=self.cost_days)
+
+    @property
+    def cost_end_date(self) -> date:
+        return COST_PERIOD_END_DATE
+
+
+ReplayResponse = tuple[int, dict[str, Any]]
+
+
+class SyntheticAwsAccount:
+    """A synthetic AWS account that answers API calls the way AWS would.
+
+    Responses are generated deterministically from ``scale``, and are built
+    lazily per call so that large scales do not hold every response in memory.
+    """
+
+    def __init__(self, scale: FixtureScale) -> None:
+        self.scale = scale
+        rng = random.Random(scale.seed)
+
+        self._bucket_names = [
+            f"bench-bucket-{i:05d}" for i in range(scale.bucket_count)
+        ]
+        self._instances = [
+            {
+                "InstanceId": f"i-{i:017x}",
+                "InstanceType": rng.choice(["t3.micro", "t3.large", "m5.xlarge"]),
+                "ImageId": f"ami-{rng.getrandbits(64):016x}",
+                "PublicIpAddress": f"203.0.{i // 256 % 256}.{i % 256}",
+                "Tags": [{"Key": "Name", "Value": f"bench-instance-{i:05d}"}],
+            }
+            for i in range(scale.instance_count)
+        ]
+        self._daily_service_costs = [
+            {service: f"{rng.uniform(0, 25):.10f}" for service in _COST_SERVICE_NAMES}
+            for _ in range(scale.cost_days)
+        ]
+
+        self._handlers: dict[tuple[str, str], Callable[..., ReplayResponse]] = {
+            ("s3", "ListBuckets"): self._list_buckets,
+            ("s3", "GetBucketPolicy"): self._get_bucket_policy,
+            ("s3", "GetBucketAcl"): self._get_bucket_acl,
+            ("s3", "ListObjectsV2"): self._list_objects_v2,
+            ("s3", "HeadObject"): self._head_object,
+            ("s3", "GetObject"): self._get_object,
+            ("ec2", "DescribeInstances"): self._describe_instances,
+            ("iam", "ListAttachedUserPolicies"): self._list_attached_user_policies,
+            ("iam", "ListGroupsForUser"): self._list_groups_for_user,
+            ("iam", "ListAttachedGroupPolicies"): self._list_attached_group_policies,
+            ("iam", "GetPolicy"): self._get_policy,
+            ("ce", "GetCostAndUsage"): self._get_cost_and_usage,
+        }
+
+    def get_fixture_values(self) -> dict[str, str]:
+        """Values that questions can reference, e.g. ``$bucket_name``."""
+        # The last instance is the worst case for filtering by name or IP.
+        instance = self._instances[-1] if self._instances else None
+        return {
+            "bucket_name": self._bucket_names[0] if self._bucket_names else "",
+            "instance_name": instance["Tags"][0]["Value"] if instance else "",
+            "instance_ipv4_address": instance["PublicIpAddress"] if instance else "",
+            "cost_start_date": self.scale.cost_start_date.isoformat(),
+            "cost_end_date": self.scale.cost_end_date.isoformat(),
+            "username": "bench-user",
+        }
+
+    def respond(
+        self, service_name: str, operation_name: str, params: dict[str, Any]
+    ) -> ReplayResponse:
+        handler = self._handlers.get((service_name, operation_name))
+        if handler is None:
+            # Never fall through to a real request, the benchmark must stay offline.
+            raise NotImplementedError(
+                f"No synthetic response for {service_name}.{operation_name}"
+            )
+
+        return handler(**params)
+
+    def _list_buckets(self) -> ReplayResponse:
+        return 200, {
+            "Buckets": [
+                {"Name": name, "CreationDate": _FIXTURE_CREATION_DATE}
+                for name in self._bucket_names
+            ],
+            "Owner": {"DisplayName": "bench", "ID": "bench-owner"},
+        }
+
+    def _get_bucket_policy(self, Bucket: str, **_: Any) -> ReplayResponse:
+        if self._get_bucket_index(Bucket) % self.scale.public_bucket_interval != 0:
+            return _error_response(404, "NoSuchBucketPolicy", "No bucket policy")
+
+        policy = {
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Principal": "*",
+                    "Action": "s3:GetObject",
+                    "Resource": f"arn:aws:s3:::{Bucket}/*",
+                }
+            ],
+        }
+        return 200, {"Policy": json.dumps(policy)}
+
+    def _get_bucket_acl(self, Bucket: str, **_: Any) -> ReplayResponse:
+        return 200, {
+            "Owner": {"DisplayName": "bench", "ID": "bench-owner"},
+            "Grants": [
+                {
+                    "Grantee": {"Type": "CanonicalUser", "ID": "bench-owner"},
+                    "Permission": "FULL_CONTROL",
+                }
+            ],
+        }
+
+    def _list_objects_v2(self, Bucket: str, **_: Any) -> ReplayResponse:
+        self._get_bucket_index(Bucket)
+        # S3 returns at most 1000 keys per page.
+        key_count = min(self.scale.objects_per_bucket, 1000)
+        return 200, {
+            "Name": Bucket,
+            "KeyCount": key_count,
+            "IsTruncated": self.scale.objects_per_bucket > key_count,
+            "Contents": [
+                {
+                    "Key": self._get_object_key(i),
+                    "Size": self._get_object_size(i),
+                    "LastModified": _FIXTURE_CREATION_DATE,
+                }
+                for i in range(key_count)
+            ],
+        }
+
+    def _head_object(self, Bucket: str, Key: str, **_: Any) -> ReplayResponse:
+        index = self._get_object_index(Key)
+        return 200, {
+            "ContentLength": self._get_object_size(index),
+            "ContentType": self._get_object_content_type(index),
+        }
+
+    def _get_object(self, Bucket: str, Key: str, **_: Any) -> ReplayResponse:
+        index = self._get_object_index(Key)
+        size = self._get_object_size(index)
+        contents = (f"{Key}\n".encode("utf-8") * (size // (len(Key) + 1) + 1))[:size]
+        return 200, {
+            "ContentLength": size,
+            "ContentType": self._get_object_content_type(index),
+            "Body": StreamingBody(BytesIO(contents), size),
+        }
+
+    def _describe_instances(
+        self, Filters: list | None = None, **_: Any
+    ) -> ReplayResponse:
+        instances = self._instances
+        for instance_filter in Filters or []:
+            values = set(instance_filter["Values"])
+            if instance_filter["Name"] == "ip-address":
+                instances = [i for i in instances if i["PublicIpAddress"] in values]
+            elif instance_filter["Name"] == "tag:Name":
+                instances = [i for i in instances if i["Tags"][0]["Value"] in values]
+            else:
+                raise NotImplementedError(
+                    f"No synthetic response for filter {instance_filter['Name']}"
+                )
+
+        per_reservation = self.scale.instances_per_reservation
+        return 200, {
+            "Reservations": [
+                {
+                    "ReservationId": f"r-{i:017x}",
+                    "Instances": instances[i : i + per_reservation],
+                }
+                for i in range(0, len(instances), per_reservation)
+            ]
+        }
+
+    def _list_attached_user_policies(self, UserName: str, **_: Any) -> ReplayResponse:
+        return 200, {
+            "AttachedPolicies": self._get_attached_policies(f"user/{UserName}")
+        }
+
+    def _list_groups_for_user(self, UserName: str, **_: Any) -> ReplayResponse:
+        return 200, {
+            "Groups": [
+                {
+                    "GroupName": f"bench-group-{i:03d}",
+                    "GroupId": f"AGPA{i:017d}",
+                    "Arn": f"arn:aws:iam::123456789012:group/bench-group-{i:03d}",
+                    "Path": "/",
+                    "CreateDate": _FIXTURE_CREATION_DATE,
+                }
+                for i in range(self.scale.group_count)
+            ]
+        }
+
+    def _list_attached_group_policies(self, GroupName: str, **_: Any) -> ReplayResponse:
+        return 200, {
+            "AttachedPolicies": self._get_attached_policies(f"group/{GroupName}")
+        }
+
+    def _get_policy(self, PolicyArn: str, **_: Any) -> ReplayResponse:
+        policy_name = PolicyArn.rsplit("/", 1)[-1]
+        return 200, {
+            "Policy": {
+                "PolicyName": policy_name,
+                "Arn": PolicyArn,
+                "Description": f"Benchmark policy {policy_name}",
+            }
+        }
+
+    def _get_cost_and_usage(self, TimePeriod: dict, **_: Any) -> ReplayResponse:
+        start_date = date.fromisoformat(TimePeriod["Start"])
+        end_date = date.fromisoformat(TimePeriod["End"])
+        day_count = min((end_date - start_date).days, len(self._daily_service_costs))
+
+        results_by_time = []
+        for day_index in range(day_count):
+            day = start_date + timedelta(days=day_index)
+            results_by_time.append(
+                {
+                    "TimePeriod": {
+                        "Start": day.isoformat(),
+                        "End": (day + timedelta(days=1)).isoformat(),
+                    },
+                    "Total": {},
+                    "Groups": [
+                        {
+                            "Keys": [service],
+                            "Metrics": {
+                                "BlendedCost": {"Amount": amount, "Unit": "USD"}
+                            },
+                        }
+                        for service, amount in self._daily_service_costs[
+                            day_index
+                        ].items()
+                    ],
+                    "Estimated": False,
+                }
+            )
+
+        return 200, {"ResultsByTime": results_by_time}
+
+    def _get_bucket_index(self, bucket_name: str) -> int:
+        index = int(bucket_name.rsplit("-", 1)[-1])
+        if index >= len(self._bucket_names):
+            raise ValueError(f"Unknown bucket {bucket_name}")
+
+        return index
+
+    def _get_attached_policies(self, principal: str) -> list[dict[str, str]]:
+        principal_name = principal.replace("/", "-")
+        return [
+            {
+                "PolicyName": f"{principal_name}-policy-{i:03d}",
+                "PolicyArn": f"arn:aws:iam::123456789012:policy/{principal_name}-policy-{i:03d}",
+            }
+            for i in range(self.scale.policies_per_principal)
+        ]
+
+    def _get_object_key(self, index: int) -> str:
+        extension = [".txt", ".json", ".bin", ".log"][index % 4]
+        return f"prefix-{index % 10}/object-{index:06d}{extension}"
+
+    def _get_object_index(self, object_key: str) -> int:
+        return int(object_key.rsplit("-", 1)[-1].split(".", 1)[0])
+
+    def _get_object_size(self, index: int) -> int:
+        # Every 20th object exceeds the helper's small file threshold, so the
+        # benchmark also covers the skipped download path.
+        if index % 20 == 19:
+            return SMALL_FILE_SIZE_THRESHOLD_MB * BYTES_PER_MB + 1
+
+        return self.scale.object_size_bytes
+
+    def _get_object_content_type(self, index: int) -> str:
+        return "application/octet-stream" if index % 4 == 2 else "text/plain"
+
+
+def create_replay_client_factory(
+    account: SyntheticAwsAccount,
+) -> Callable[..., BaseClient]:
+    """Build a drop-in replacement for ``boto3.client`` backed by ``account``.
+
+    The returned clients are real botocore clients, so parameter validation,
+    request serialization and client events all run as in production. Only
+    the HTTP round trip is replaced by the synthetic account's response.
+
+    Each response carries a body encoded in the service's wire protocol (JSON
+    or XML), so that response sizes are measured like real ones. The encoding
+    approximates what AWS sends: element names and list wrapping follow a
+    simplified layout, so sizes are close to, not exactly, AWS's.
+    """
+    session = boto3.session.Session(
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+        region_name=_FIXTURE_REGION,
+    )
+
+    def create_client(service_name: str, *args: Any, **kwargs: Any) -> BaseClient:
+        client = session.client(service_name, *args, **kwargs)
+
+        def record_client_params(params: dict, context: dict, **_: Any) -> None:
+            context[_CLIENT_PARAMS_CONTEXT_KEY] = dict(params)
+
+        def replay_response(model, context: dict, **_: Any):
+            status_code, parsed = account.respond(
+                service_name=model.service_model.service_name,
+                operation_name=model.name,
+                params=context[_CLIENT_PARAMS_CONTEXT_KEY],
+            )
+            parsed.setdefault("ResponseMetadata", {}).update(
+                {"HTTPStatusCode": status_code, "RetryAttempts": 0}
+            )
+            url = f"https://{service_name}.{_FIXTURE_REGION}.amazonaws.com/"
+            body = _encode_response_body(model, parsed)
+            if body is None:
+                # Streaming bodies are left unread, like real ones, and are
+                # measured from the content-length header.
+                http_response = AWSResponse(
+                    url=url,
+                    status_code=status_code,
+                    headers={"content-length": str(parsed["ContentLength"])},
+                    raw=None,
+                )
+            else:
+                # No content-length header, so byte counts come from the body
+                # the same way as for chunked responses from AWS.
+                http_response = AWSResponse(
+                    url=url,
+                    status_code=status_code,
+                    headers={},
+                    raw=HTTPResponse(body=BytesIO(body), preload_content=False),
+                )
+            return http_response, parsed
+
+        # Registered last so that other before-call handlers (e.g. tracing)
+        # still run before the response short-circuits the HTTP request.
+        service_event_name = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(
+            f"before-parameter-build.{service_event_name}.*", record_client_params
+        )
+        client.meta.events.register_last(
+            f"before-call.{service_event_name}.*", replay_response
+        )
+
+        return client
+
+    return create_client
+
+
+def _encode_response_body(model, parsed: dict[str, Any]) -> bytes | None:
+    if model.has_streaming_output:
+        return None
+
+    protocol = model.service_model.metadata["protocol"]
+    if "Error" in parsed:
+        body = {"Error": parsed["Error"]}
+    else:
+        body = {
+            key: value
+            for key, value in parsed.items()
+            if key != "ResponseMetadata" and _is_body_member(model.output_shape, key)
+        }
+
+        # Payload members (e.g. S3's GetBucketPolicy) are sent as the body itself.
+        payload = model.output_shape.serialization.get("payload")
+        if payload is not None and isinstance(body.get(payload), str):
+            return body[payload].encode("utf-8")
+
+    if protocol == "json":
+        return json.dumps(body, default=str).encode("utf-8")
+
+    if not body:
+        return b""
+
+    # S3 flattens lists into repeated elements, EC2 wraps items in <item> and
+    # the other query protocol services wrap them in <member>.
+    list_item_name = {"rest-xml": None, "ec2": "item"}.get(protocol, "member")
+    return _to_xml(f"{model.name}Response", body, list_item_name).encode("utf-8")
+
+
+def _is_body_member(output_shape, member_name: str) -> bool:
+    if output_shape is None or member_name not in output_shape.members:
+        return True
+
+    # Members such as HeadObject's ContentLength are sent as headers.
+    return output_shape.members[member_name].serialization.get("location") is None
+
+
+def _to_xml(name: str, value: Any, list_item_name: str | None) -> str:
+    if isinstance(value, dict):
+        children = "".join(
+            _to_xml(key, item, list_item_name) for key, item in value.items()
+        )
+        return f"<{name}>{children}</{name}>"
+    elif isinstance(value, list):
+        if list_item_name is None:
+            return "".join(_to_xml(name, item, list_item_name) for item in value)
+
+        items = "".join(_to_xml(list_item_name, item, list_item_name) for item in value)
+        return f"<{name}>{items}</{name}>"
+    elif isinstance(value, bool):
+        text = "true" if value else "false"
+    elif isinstance(value, datetime):
+        text = value.isoformat()
+    else:
+        text = xml_escape(str(value))
+
+    return f"<{name}>{text}</{name}>"
+
+
+def _error_response(status_code: int, code: str, message: str) -> ReplayResponse:
+    return status_code, {"Error": {"Code": code, "Message": message}}
@@ -0,0 +1,408 @@
+"""Offline replay benchmark for the chatbot's agent turns.
+
+Replays a corpus of chat questions through the real agent executor, tools and
+helpers, with a scripted LLM and botocore clients that answer from a synthetic
+AWS account instead of the network. Run from the project root:
+
+    python -m benchmarks.run --buckets 500 --instances 1000 --cost-days 90
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from string import Template
+from typing import Any
+
+from langchain.agents import AgentExecutor
+
+from agent import set_up_agent_executor
+from benchmarks.fake_llm import ScriptedChatModel, ScriptedToolCall
+from benchmarks.fixtures import (
+    FixtureScale,
+    SyntheticAwsAccount,
+    create_replay_client_factory,
+)
+from lib.cost_explorer_helper import CostExplorerHelper
+from lib.ec2_helper import Ec2Helper
+from lib.iam_helper import IamHelper
+from lib.s3_helper import S3Helper
+from lib.tracing import SpanKind, TurnTrace, trace_turn
+from tools.callbacks import TracingCallbackHandler
+from tools.common import AwsClientFactory, create_aws_client
+
+DEFAULT_QUESTIONS_PATH = Path(__file__).parent / "questions.json"
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+# Helper classes by name, with the AWS service their client is created for.
+_HELPER_CLASSES: dict[str, tuple[type, str]] = {
+    "S3Helper": (S3Helper, "s3"),
+    "Ec2Helper": (Ec2Helper, "ec2"),
+    "IamHelper": (IamHelper, "iam"),
+    "CostExplorerHelper": (CostExplorerHelper, "ce"),
+}
+
+
+@dataclass
+class BenchmarkQuestion:
+    question: str
+    helper: str
+    helper_arguments: dict[str, Any]
+    tool_call: ScriptedToolCall
+
+
+@dataclass
+class QuestionResult:
+    question: str
+    helper: str
+    iterations: int
+    latency_ms: dict[str, float]
+    helper_latency_ms: dict[str, float]
+    aws_call_count: int
+    aws_calls_by_operation: dict[str, int]
+    aws_response_bytes: int
+    turn_peak_memory_bytes: int
+    helper_peak_memory_bytes: int
+    error: str | None = None
+
+
+def load_questions(
+    questions_path: Path, fixture_values: dict[str, str]
+) -> list[BenchmarkQuestion]:
+    with open(questions_path) as questions_file:
+        raw_questions = json.load(questions_file)
+
+    return [
+        BenchmarkQuestion(
+            question=_substitute(raw_question["question"], fixture_values),
+            helper=raw_question["helper"],
+            helper_arguments=_substitute(
+                raw_question["helper_arguments"], fixture_values
+            ),
+            tool_call=ScriptedToolCall(
+                tool_name=raw_question["tool"],
+                arguments=_substitute(raw_question["arguments"], fixture_values),
+            ),
+        )
+        for raw_question in raw_questions
+    ]
+
+
+def run_benchmark(
+    questions: list[BenchmarkQuestion],
+    account: SyntheticAwsAccount,
+    iterations: int,
+    warmup_iterations: int,
+    llm_latency_seconds: float = 0.0,
+) -> list[QuestionResult]:
+    llm = ScriptedChatModel(
+        tool_calls_by_question={
+            question.question: question.tool_call for question in questions
+        },
+        latency_seconds=llm_latency_seconds,
+    )
+
+    aws_client_factory = create_replay_client_factory(account)
+    agent_executor = set_up_agent_executor(
+        llm=llm, aws_client_factory=aws_client_factory
+    )
+    return [
+        _run_question(
+            agent_executor, aws_client_factory, question, iterations, warmup_iterations
+        )
+        for question in questions
+    ]
+
+
+def format_report(results: list[QuestionResult]) -> str:
+    headers = [
+        "helper",
+        *[f"p{percentile} ms" for percentile in LATENCY_PERCENTILES],
+        "max ms",
+        "helper p50 ms",
+        "AWS calls",
+        "AWS resp KiB",
+        "helper peak MiB",
+        "turn peak MiB",
+        "question",
+    ]
+    rows = []
+    errors_by_row: dict[int, str] = {}
+    for result in results:
+        if result.error is not None:
+            # Errors such as ParamValidationError span several lines, so they
+            # are collapsed onto one line under their row to keep the table.
+            errors_by_row[len(rows)] = " ".join(result.error.split())
+            rows.append([result.helper, *["-"] * (len(headers) - 2), result.question])
+            continue
+
+        rows.append(
+            [
+                result.helper,
+                *[
+                    f"{result.latency_ms[f'p{percentile}']:.1f}"
+                    for percentile in LATENCY_PERCENTILES
+                ],
+                f"{result.latency_ms['max']:.1f}",
+                f"{result.helper_latency_ms['p50']:.1f}",
+                str(result.aws_call_count),
+                f"{result.aws_response_bytes / 1024:.1f}",
+                f"{result.helper_peak_memory_bytes / 1024**2:.2f}",
+                f"{result.turn_peak_memory_bytes / 1024**2:.2f}",
+                result.question,
+            ]
+        )
+
+    widths = [
+        max(len(row[column]) for row in [headers, *rows])
+        for column in range(len(headers) - 1)
+    ]
+    lines = [_format_row(headers, widths)]
+    lines.append("-" * len(lines[0]))
+    for row_index, row in enumerate(rows):
+        lines.append(_format_row(row, widths))
+        if row_index in errors_by_row:
+            lines.append(f"  error: {errors_by_row[row_index]}")
+
+    return "\n".join(lines)
+
+
+def _format_row(row: list[str], widths: list[int]) -> str:
+    # The last column is the question, which is left unpadded.
+    return (
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+        + f"  {row[-1]}"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay chat questions against a synthetic AWS account, offline."
+    )
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS_PATH)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0,
+        help="simulated latency per LLM call, 0 measures only local overhead",
+    )
+    parser.add_argument("--buckets", type=int, default=FixtureScale.bucket_count)
+    parser.add_argument(
+        "--objects-per-bucket", type=int, default=FixtureScale.objects_per_bucket
+    )
+    parser.add_argument(
+        "--object-size-bytes", type=int, default=FixtureScale.object_size_bytes
+    )
+    parser.add_argument("--instances", type=int, default=FixtureScale.instance_count)
+    parser.add_argument("--groups", type=int, default=FixtureScale.group_count)
+    parser.add_argument(
+        "--policies", type=int, default=FixtureScale.policies_per_principal
+    )
+    parser.add_argument("--cost-days", type=int, default=FixtureScale.cost_days)
+    parser.add_argument("--seed", type=int, default=FixtureScale.seed)
+    parser.add_argument(
+        "--output", type=Path, help="also write the full results as JSON"
+    )
+    args = parser.parse_args(argv)
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+
+    # LangSmith tracing may be enabled through .env, but must not send anything.
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    scale = FixtureScale(
+        bucket_count=args.buckets,
+        objects_per_bucket=args.objects_per_bucket,
+        object_size_bytes=args.object_size_bytes,
+        instance_count=args.instances,
+        group_count=args.groups,
+        policies_per_principal=args.policies,
+        cost_days=args.cost_days,
+        seed=args.seed,
+    )
+    account = SyntheticAwsAccount(scale)
+    questions = load_questions(args.questions, account.get_fixture_values())
+    results = run_benchmark(
+        questions,
+        account,
+        iterations=args.iterations,
+        warmup_iterations=args.warmup,
+        llm_latency_seconds=args.llm_latency_ms / 1000,
+    )
+
+    print(format_report(results))
+
+    if args.output is not None:
+        report = {
+            "scale": asdict(scale),
+            "iterations": args.iterations,
+            "warmup_iterations": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+            "results": [asdict(result) for result in results],
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+def _run_question(
+    agent_executor: AgentExecutor,
+    aws_client_factory: AwsClientFactory,
+    question: BenchmarkQuestion,
+    iterations: int,
+    warmup_iterations: int,
+) -> QuestionResult:
+    try:
+        for _ in range(warmup_iterations):
+            _time_turn(agent_executor, question.question)
+
+        # Timed turns run untraced, like production turns without
+        # TRACE_OUTPUT_DIR, so tracing overhead is not part of the latencies.
+        latencies_ms = [
+            _time_turn(agent_executor, question.question) for _ in range(iterations)
+        ]
+
+        # AWS call counts and bytes come from a separate traced turn.
+        trace = _trace_turn(agent_executor, question.question)
+
+        # Memory is measured in a separate turn since tracemalloc slows down
+        # allocation heavy code and would skew the latencies.
+        tracemalloc.start()
+        try:
+            _time_turn(agent_executor, question.question)
+            _, turn_peak_memory_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        helper_latency_ms, helper_peak_memory_bytes = _measure_helper(
+            aws_client_factory, question, iterations, warmup_iterations
+        )
+    except Exception as e:
+        # Tools wrap helper errors (e.g. ToolException), so the cause is the
+        # more useful error to report.
+        cause = e.__cause__ or e
+        return QuestionResult(
+            question=question.question,
+            helper=question.helper,
+            iterations=0,
+            latency_ms={},
+            helper_latency_ms={},
+            aws_call_count=0,
+            aws_calls_by_operation={},
+            aws_response_bytes=0,
+            turn_peak_memory_bytes=0,
+            helper_peak_memory_bytes=0,
+            error=f"{type(cause).__name__}: {cause}",
+        )
+
+    aws_spans = [span for span in trace.spans if span.kind == SpanKind.AWS_API]
+    return QuestionResult(
+        question=question.question,
+        helper=question.helper,
+        iterations=iterations,
+        latency_ms=_summarize_latencies(latencies_ms),
+        helper_latency_ms=_summarize_latencies(helper_latency_ms),
+        aws_call_count=len(aws_spans),
+        aws_calls_by_operation=dict(Counter(span.name for span in aws_spans)),
+        aws_response_bytes=sum(
+            span.attributes.get("response_bytes", 0) for span in aws_spans
+        ),
+        turn_peak_memory_bytes=turn_peak_memory_bytes,
+        helper_peak_memory_bytes=helper_peak_memory_bytes,
+    )
+
+
+def _measure_helper(
+    aws_client_factory: AwsClientFactory,
+    question: BenchmarkQuestion,
+    iterations: int,
+    warmup_iterations: int,
+) -> tuple[list[float], int]:
+    """Time the question's helper call directly and measure its peak memory.
+
+    Unlike whole turns, this excludes LangChain's prompt formatting, output
+    parsing and tool dispatch, so the numbers belong to the helper alone.
+    """
+    class_name, method_name = question.helper.split(".")
+    helper_class, service_name = _HELPER_CLASSES[class_name]
+    # Created outside the measurements, since tools create one client per call
+    # and that cost is already part of the turn latencies.
+    helper = helper_class(
+        create_aws_client(service_name, client_factory=aws_client_factory)
+    )
+    helper_method = getattr(helper, method_name)
+
+    for _ in range(warmup_iterations):
+        helper_method(**question.helper_arguments)
+
+    latencies_ms = []
+    for _ in range(iterations):
+        start_counter = time.perf_counter()
+        helper_method(**question.helper_arguments)
+        latencies_ms.append((time.perf_counter() - start_counter) * 1000)
+
+    tracemalloc.start()
+    try:
+        helper_method(**question.helper_arguments)
+        _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return latencies_ms, peak_memory_bytes
+
+
+def _time_turn(agent_executor: AgentExecutor, question: str) -> float:
+    start_counter = time.perf_counter()
+    agent_executor.invoke({"input": question})
+
+    return (time.perf_counter() - start_counter) * 1000
+
+
+def _trace_turn(agent_executor: AgentExecutor, question: str) -> TurnTrace:
+    with trace_turn(question=question) as trace:
+        agent_executor.invoke(
+            {"input": question},
+            config={"callbacks": [TracingCallbackHandler(trace)]},
+        )
+
+    return trace
+
+
+def _summarize_latencies(latencies_ms: list[float]) -> dict[str, float]:
+    sorted_latencies_ms = sorted(latencies_ms)
+    summary = {
+        f"p{percentile}": _get_percentile(sorted_latencies_ms, percentile)
+        for percentile in LATENCY_PERCENTILES
+    }
+    summary["mean"] = statistics.fmean(sorted_latencies_ms)
+    summary["max"] = sorted_latencies_ms[-1]
+
+    return summary
+
+
+def _get_percentile(sorted_values: list[float], percentile: int) -> float:
+    # Nearest-rank method, so every reported value is an observed latency.
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def _substitute(value: Any, fixture_values: dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return Template(value).substitute(fixture_values)
+    elif isinstance(value, dict):
+        return {key: _substitute(item, fixture_values) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_substitute(item, fixture_values) for item in value]
+
+    return value
+
+
+if __name__ == "__main__":
+    main()
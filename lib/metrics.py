@@ -0,0 +1,164 @@
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from lib.tracing import SpanKind, TurnTrace
+
+DEFAULT_LATENCY_BUCKETS_SECONDS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_METRIC_PREFIX = "aws_chatbot"
+
+
+@dataclass
+class _Histogram:
+    bucket_bounds: tuple[float, ...]
+    bucket_counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        self.bucket_counts = [0] * len(self.bucket_bounds)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bucket_bounds, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Aggregates finished turn traces into Prometheus text-format metrics.
+
+    The rendered output is suitable for the node_exporter textfile collector or
+    for reading directly.
+    """
+
+    def __init__(
+        self,
+        latency_buckets_seconds: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS_SECONDS,
+    ) -> None:
+        self._latency_buckets_seconds = latency_buckets_seconds
+        self._lock = threading.Lock()
+        # Separate from _lock, so observing turns never waits on disk writes.
+        self._write_lock = threading.Lock()
+        self._span_latencies: dict[tuple[str, str], _Histogram] = {}
+        self._span_errors: dict[tuple[str, str], int] = {}
+        self._aws_bytes: dict[tuple[str, str, str], int] = {}
+
+    def observe_trace(self, trace: TurnTrace) -> None:
+        with self._lock:
+            for span in trace.spans:
+                if span.duration_ms is None:
+                    continue
+
+                labels = (span.kind.value, span.name)
+                histogram = self._span_latencies.setdefault(
+                    labels, _Histogram(bucket_bounds=self._latency_buckets_seconds)
+                )
+                histogram.observe(span.duration_ms / 1000)
+
+                if span.error is not None:
+                    self._span_errors[labels] = self._span_errors.get(labels, 0) + 1
+
+                if span.kind == SpanKind.AWS_API:
+                    for direction in ["request", "response"]:
+                        key = (
+                            span.attributes.get("service", ""),
+                            span.attributes.get("operation", ""),
+                            direction,
+                        )
+                        self._aws_bytes[key] = self._aws_bytes.get(
+                            key, 0
+                        ) + span.attributes.get(f"{direction}_bytes", 0)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                f"# HELP {_METRIC_PREFIX}_span_duration_seconds Duration of traced spans.",
+                f"# TYPE {_METRIC_PREFIX}_span_duration_seconds histogram",
+            ]
+            for (kind, name), histogram in sorted(self._span_latencies.items()):
+                labels = _format_labels(kind=kind, name=name)
+                cumulative_count = 0
+                for bound, bucket_count in zip(
+                    histogram.bucket_bounds, histogram.bucket_counts
+                ):
+                    cumulative_count += bucket_count
+                    bucket_labels = _format_labels(kind=kind, name=name, le=str(bound))
+                    lines.append(
+                        f"{_METRIC_PREFIX}_span_duration_seconds_bucket{bucket_labels} {cumulative_count}"
+                    )
+                inf_labels = _format_labels(kind=kind, name=name, le="+Inf")
+                lines.extend(
+                    [
+                        f"{_METRIC_PREFIX}_span_duration_seconds_bucket{inf_labels} {histogram.count}",
+                        f"{_METRIC_PREFIX}_span_duration_seconds_sum{labels} {histogram.total}",
+                        f"{_METRIC_PREFIX}_span_duration_seconds_count{labels} {histogram.count}",
+                    ]
+                )
+
+            lines.extend(
+                [
+                    f"# HELP {_METRIC_PREFIX}_span_errors_total Traced spans that ended in an error.",
+                    f"# TYPE {_METRIC_PREFIX}_span_errors_total counter",
+                ]
+            )
+            for (kind, name), error_count in sorted(self._span_errors.items()):
+                labels = _format_labels(kind=kind, name=name)
+                lines.append(
+                    f"{_METRIC_PREFIX}_span_errors_total{labels} {error_count}"
+                )
+
+            lines.extend(
+                [
+                    f"# HELP {_METRIC_PREFIX}_aws_api_bytes_total Bytes sent to and received from AWS APIs.",
+                    f"# TYPE {_METRIC_PREFIX}_aws_api_bytes_total counter",
+                ]
+            )
+            for (service, operation, direction), byte_count in sorted(
+                self._aws_bytes.items()
+            ):
+                labels = _format_labels(
+                    service=service, operation=operation, direction=direction
+                )
+                lines.append(
+                    f"{_METRIC_PREFIX}_aws_api_bytes_total{labels} {byte_count}"
+                )
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_path: Path) -> None:
+        metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so scrapers never observe a partially written file.
+        # Writes are serialized, since concurrent turns share the temporary file.
+        temporary_path = metrics_path.with_suffix(f".{os.getpid()}.tmp")
+        with self._write_lock:
+            temporary_path.write_text(self.render())
+            temporary_path.replace(metrics_path)
+
+
+def _format_labels(**labels: str) -> str:
+    formatted_labels = ",".join(
+        f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()
+    )
+    return "{" + formatted_labels + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
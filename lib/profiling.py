@@ -0,0 +1,88 @@
+import cProfile
+import importlib.util
+import logging
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProfilerType(Enum):
+    CPROFILE = "cprofile"
+    PYINSTRUMENT = "pyinstrument"
+
+
+def is_profiler_available(profiler_type: ProfilerType) -> bool:
+    if profiler_type == ProfilerType.PYINSTRUMENT:
+        # pyinstrument is an optional dependency, only needed when requested.
+        return importlib.util.find_spec("pyinstrument") is not None
+
+    return True
+
+
+def get_profile_path(profiler_type: ProfilerType, output_path_stem: Path) -> Path:
+    if profiler_type == ProfilerType.PYINSTRUMENT:
+        return output_path_stem.with_suffix(".html")
+
+    return output_path_stem.with_suffix(".prof")
+
+
+@contextmanager
+def profile(
+    profiler_type: ProfilerType | None, output_path_stem: Path
+) -> Iterator[Path | None]:
+    """Profile the enclosed block, writing the result next to ``output_path_stem``.
+
+    cProfile output is a ``pstats`` dump (``python -m pstats <file>``, snakeviz),
+    pyinstrument output is a self-contained HTML report.
+    """
+    if profiler_type is None:
+        yield None
+        return
+
+    profile_path = get_profile_path(profiler_type, output_path_stem)
+    try:
+        profile_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        # Profiling is diagnostic only and must never fail the profiled work.
+        _LOGGER.warning(f"Error creating profile directory, profiling disabled: {e}")
+        yield None
+        return
+
+    if profiler_type == ProfilerType.CPROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profile_path
+        finally:
+            profiler.disable()
+            _write_profile(profile_path, lambda: profiler.dump_stats(profile_path))
+    elif profiler_type == ProfilerType.PYINSTRUMENT:
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield profile_path
+        finally:
+            profiler.stop()
+            _write_profile(
+                profile_path,
+                lambda: profile_path.write_text(
+                    profiler.output_html(), encoding="utf-8"
+                ),
+            )
+    else:
+        raise ValueError(f"Unexpected profiler type {profiler_type}")
+
+
+def _write_profile(profile_path: Path, write: Callable[[], Any]) -> None:
+    try:
+        write()
+    except OSError as e:
+        _LOGGER.warning(f"Error writing profile to {profile_path}: {e}")
+        return
+
+    _LOGGER.info(f"Wrote profile to {profile_path}")
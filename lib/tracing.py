@@ -0,0 +1,370 @@
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlencode
+
+from botocore.client import BaseClient
+
+from lib.profiling import ProfilerType, is_profiler_available
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_OUTPUT_DIR_ENV_VAR = "TRACE_OUTPUT_DIR"
+TRACE_PROFILER_ENV_VAR = "TRACE_PROFILER"
+
+
+class SpanKind(Enum):
+    TURN = "turn"
+    CHAIN = "chain"
+    LLM = "llm"
+    TOOL = "tool"
+    AWS_API = "aws_api"
+    # Creating a boto3 client, which loads service models and credentials.
+    AWS_CLIENT = "aws_client"
+
+
+@dataclass
+class Span:
+    span_id: str
+    parent_id: str | None
+    kind: SpanKind
+    name: str
+    start_time: float
+    start_counter: float
+    duration_ms: float | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind.value,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+@dataclass
+class TurnTrace:
+    trace_id: str
+    question: str
+    root: Span
+    spans: list[Span] = field(default_factory=list)
+    _active_spans: list[Span] = field(default_factory=list)
+
+    @classmethod
+    def start(cls, question: str, trace_id: str | None = None) -> "TurnTrace":
+        root = _new_span(kind=SpanKind.TURN, name="turn", parent_id=None)
+        return cls(
+            trace_id=trace_id or uuid.uuid4().hex,
+            question=question,
+            root=root,
+            spans=[root],
+            _active_spans=[root],
+        )
+
+    def start_span(
+        self,
+        kind: SpanKind,
+        name: str,
+        parent: Span | None = None,
+        activate: bool = False,
+        attributes: dict[str, Any] | None = None,
+    ) -> Span:
+        """Open a span under ``parent``, or under the innermost active span.
+
+        Activated spans become the default parent for spans opened while they
+        are running (e.g. AWS API calls made from inside a tool).
+        """
+        if parent is None:
+            parent = self._active_spans[-1] if self._active_spans else self.root
+
+        span = _new_span(kind=kind, name=name, parent_id=parent.span_id)
+        if attributes:
+            span.attributes.update(attributes)
+
+        self.spans.append(span)
+        if activate:
+            self._active_spans.append(span)
+
+        return span
+
+    def end_span(self, span: Span, error: BaseException | None = None) -> None:
+        span.duration_ms = (time.perf_counter() - span.start_counter) * 1000
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+
+        # Spans are not guaranteed to close in LIFO order, so remove by identity.
+        for index in range(len(self._active_spans) - 1, -1, -1):
+            if self._active_spans[index] is span:
+                del self._active_spans[index]
+                break
+
+    @contextmanager
+    def span(self, kind: SpanKind, name: str, **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(
+            kind=kind, name=name, activate=True, attributes=attributes
+        )
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+
+    def summary(self) -> dict[str, Any]:
+        """Span counts, self durations and AWS bytes per span kind.
+
+        Self durations exclude the time of child spans, so they add up to the
+        turn duration instead of counting nested spans (e.g. the AWS calls in
+        a tool, or everything inside the agent executor chain) more than once.
+        """
+        child_durations_ms: dict[str, float] = {}
+        for span in self.spans:
+            if span.parent_id is not None:
+                child_durations_ms[span.parent_id] = child_durations_ms.get(
+                    span.parent_id, 0
+                ) + (span.duration_ms or 0)
+
+        summary: dict[str, Any] = {
+            "duration_ms": self.root.duration_ms,
+            "aws_request_bytes": 0,
+            "aws_response_bytes": 0,
+        }
+        for kind in SpanKind:
+            spans = [span for span in self.spans if span.kind == kind]
+            if kind != SpanKind.TURN:
+                summary[f"{kind.value}_count"] = len(spans)
+            summary[f"{kind.value}_self_duration_ms"] = sum(
+                max(
+                    (span.duration_ms or 0) - child_durations_ms.get(span.span_id, 0), 0
+                )
+                for span in spans
+            )
+
+        for span in self.spans:
+            if span.kind == SpanKind.AWS_API:
+                summary["aws_request_bytes"] += span.attributes.get("request_bytes", 0)
+                summary["aws_response_bytes"] += span.attributes.get(
+                    "response_bytes", 0
+                )
+
+        return summary
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "question": self.question,
+            "summary": self.summary(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+@dataclass
+class TracingConfig:
+    output_dir: Path
+    profiler: ProfilerType | None = None
+
+    @classmethod
+    def from_env(cls) -> "TracingConfig | None":
+        output_dir = os.environ.get(TRACE_OUTPUT_DIR_ENV_VAR)
+        if not output_dir:
+            return None
+
+        profiler = None
+        profiler_name = os.environ.get(TRACE_PROFILER_ENV_VAR)
+        if profiler_name:
+            try:
+                profiler = ProfilerType(profiler_name.lower())
+            except ValueError:
+                _LOGGER.warning(
+                    f"Unknown profiler '{profiler_name}' in {TRACE_PROFILER_ENV_VAR}, "
+                    f"expected one of {[p.value for p in ProfilerType]}, "
+                    "profiling disabled"
+                )
+            if profiler is not None and not is_profiler_available(profiler):
+                _LOGGER.warning(
+                    f"Profiler '{profiler.value}' is not installed, profiling disabled"
+                )
+                profiler = None
+
+        return cls(output_dir=Path(output_dir), profiler=profiler)
+
+    @property
+    def traces_dir(self) -> Path:
+        return self.output_dir / "traces"
+
+    @property
+    def profiles_dir(self) -> Path:
+        return self.output_dir / "profiles"
+
+    @property
+    def metrics_path(self) -> Path:
+        return self.output_dir / "metrics.prom"
+
+
+_CURRENT_TRACE: ContextVar[TurnTrace | None] = ContextVar("current_trace", default=None)
+
+
+_CURRENT_AWS_API_SPAN: ContextVar[Span | None] = ContextVar(
+    "current_aws_api_span", default=None
+)
+
+# Set on clients by instrument_aws_client, so they are only instrumented once.
+_INSTRUMENTED_ATTRIBUTE = "_aws_chatbot_instrumented"
+
+
+def get_current_trace() -> TurnTrace | None:
+    return _CURRENT_TRACE.get()
+
+
+@contextmanager
+def trace_turn(question: str, trace_id: str | None = None) -> Iterator[TurnTrace]:
+    trace = TurnTrace.start(question=question, trace_id=trace_id)
+    token = _CURRENT_TRACE.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.end_span(trace.root, error=e)
+        raise
+    else:
+        trace.end_span(trace.root)
+    finally:
+        _CURRENT_TRACE.reset(token)
+
+
+def write_trace_file(trace: TurnTrace, traces_dir: Path) -> Path:
+    traces_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.fromtimestamp(trace.root.start_time, tz=timezone.utc)
+    trace_path = traces_dir / f"{timestamp:%Y%m%dT%H%M%S}-{trace.trace_id}.json"
+    trace_path.write_text(json.dumps(trace.to_dict(), indent=2, default=str))
+
+    return trace_path
+
+
+def instrument_aws_client(client: BaseClient) -> BaseClient:
+    """Record an AWS API span for every call made through ``client``.
+
+    Spans are only recorded while a turn is being traced, so instrumented
+    clients can be used freely outside of ``trace_turn``. Instrumenting a
+    client again, e.g. one reused by a caching client factory, has no effect.
+    """
+    if getattr(client, _INSTRUMENTED_ATTRIBUTE, False):
+        return client
+
+    make_api_call = client._make_api_call
+
+    # Every generated client method goes through _make_api_call, so wrapping
+    # it guarantees the span is closed however the call ends, including
+    # failures raised before any request is sent (e.g. parameter validation).
+    def traced_make_api_call(operation_name: str, api_params: dict) -> dict:
+        trace = get_current_trace()
+        if trace is None:
+            return make_api_call(operation_name, api_params)
+
+        service_name = client.meta.service_model.service_name
+        span = trace.start_span(
+            kind=SpanKind.AWS_API,
+            name=f"{service_name}.{operation_name}",
+            attributes={"service": service_name, "operation": operation_name},
+        )
+        token = _CURRENT_AWS_API_SPAN.set(span)
+        try:
+            result = make_api_call(operation_name, api_params)
+        except Exception as e:
+            trace.end_span(span, error=e)
+            raise
+        finally:
+            _CURRENT_AWS_API_SPAN.reset(token)
+
+        trace.end_span(span)
+        return result
+
+    client._make_api_call = traced_make_api_call
+    setattr(client, _INSTRUMENTED_ATTRIBUTE, True)
+
+    # Event names use the hyphenized service ID (e.g. "cost-explorer" for "ce").
+    service_event_name = client.meta.service_model.service_id.hyphenize()
+    client.meta.events.register(
+        f"before-call.{service_event_name}.*",
+        _record_aws_api_request,
+        unique_id=f"tracing-request-{service_event_name}",
+    )
+    client.meta.events.register(
+        f"after-call.{service_event_name}.*",
+        _record_aws_api_response,
+        unique_id=f"tracing-response-{service_event_name}",
+    )
+
+    return client
+
+
+def _new_span(kind: SpanKind, name: str, parent_id: str | None) -> Span:
+    return Span(
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent_id,
+        kind=kind,
+        name=name,
+        start_time=time.time(),
+        start_counter=time.perf_counter(),
+    )
+
+
+def _record_aws_api_request(params: dict, **kwargs) -> None:
+    span = _CURRENT_AWS_API_SPAN.get()
+    if span is None:
+        return
+
+    span.attributes["request_bytes"] = _get_body_size(params.get("body"))
+
+
+def _record_aws_api_response(http_response, parsed: dict, model, **kwargs) -> None:
+    span = _CURRENT_AWS_API_SPAN.get()
+    if span is None:
+        return
+
+    span.attributes["status_code"] = http_response.status_code
+    span.attributes["response_bytes"] = _get_response_size(http_response, model)
+    span.attributes["retry_attempts"] = parsed.get("ResponseMetadata", {}).get(
+        "RetryAttempts", 0
+    )
+
+
+def _get_response_size(http_response, model) -> int:
+    # Large responses (e.g. DescribeInstances, ListObjectsV2) are often sent
+    # with chunked transfer encoding and no content-length header, so measure
+    # the body that botocore has already read. Streaming bodies have not been
+    # read yet, and responses without a raw body (e.g. from botocore's
+    # Stubber) have nothing to measure, so fall back to the header for those.
+    if not model.has_streaming_output and http_response.raw is not None:
+        return len(http_response.content)
+
+    return int(http_response.headers.get("content-length", 0))
+
+
+def _get_body_size(body: Any) -> int:
+    # Query protocol services (EC2, IAM) pass the form body as a dict until
+    # the request is prepared.
+    if isinstance(body, dict):
+        return len(urlencode(body, doseq=True))
+    elif isinstance(body, str):
+        return len(body.encode("utf-8"))
+    elif isinstance(body, (bytes, bytearray)):
+        return len(body)
+
+    # Streaming bodies are not read just to measure them.
+    return 0
@@ -0,0 +1,124 @@
+import json
+import pstats
+
+import pytest
+from langchain_core.tools import ToolException
+
+import agent
+from agent import invoke_agent, set_up_agent_executor
+from benchmarks.fake_llm import ScriptedChatModel, ScriptedToolCall
+from benchmarks.fixtures import (
+    FixtureScale,
+    SyntheticAwsAccount,
+    create_replay_client_factory,
+)
+from lib.metrics import MetricsRegistry
+from lib.profiling import ProfilerType
+from lib.tracing import TracingConfig, get_current_trace
+
+LIST_BUCKETS_QUESTION = "Which S3 buckets do I have?"
+FAILING_QUESTION = "What data is in the bucket named 'bad bucket name!'?"
+
+
+@pytest.fixture
+def agent_executor():
+    llm = ScriptedChatModel(
+        tool_calls_by_question={
+            LIST_BUCKETS_QUESTION: ScriptedToolCall(
+                tool_name="AwsS3",
+                arguments={"operation": {"operation_type": "list"}},
+            ),
+            # Fails parameter validation, so the tool raises a ToolException.
+            FAILING_QUESTION: ScriptedToolCall(
+                tool_name="AwsS3",
+                arguments={
+                    "operation": {
+                        "operation_type": "describe_data_contents",
+                        "bucket_name": "bad bucket name!",
+                    }
+                },
+            ),
+        }
+    )
+    account = SyntheticAwsAccount(FixtureScale(bucket_count=2))
+    return set_up_agent_executor(
+        llm=llm, aws_client_factory=create_replay_client_factory(account)
+    )
+
+
+@pytest.fixture(autouse=True)
+def metrics_registry(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(agent, "_METRICS_REGISTRY", registry)
+    return registry
+
+
+def read_trace(tracing_config: TracingConfig) -> dict:
+    [trace_path] = tracing_config.traces_dir.glob("*.json")
+    return json.loads(trace_path.read_text())
+
+
+def test_invoke_agent_exports_trace_metrics_and_profile(agent_executor, tmp_path):
+    tracing_config = TracingConfig(output_dir=tmp_path, profiler=ProfilerType.CPROFILE)
+
+    invoke_agent(agent_executor, LIST_BUCKETS_QUESTION, tracing_config)
+
+    trace = read_trace(tracing_config)
+    assert trace["question"] == LIST_BUCKETS_QUESTION
+    assert trace["summary"]["aws_api_count"] == 1
+    root = trace["spans"][0]
+    assert root["error"] is None
+    [profile_path] = tracing_config.profiles_dir.glob("*.prof")
+    assert root["attributes"]["profile_path"] == str(profile_path)
+    assert profile_path.stem == trace["trace_id"]
+    assert pstats.Stats(str(profile_path)).total_calls > 0
+    assert 'kind="aws_api",name="s3.ListBuckets"' in (
+        tracing_config.metrics_path.read_text()
+    )
+
+
+def test_invoke_agent_exports_failed_turns(agent_executor, tmp_path):
+    tracing_config = TracingConfig(output_dir=tmp_path, profiler=ProfilerType.CPROFILE)
+
+    with pytest.raises(ToolException):
+        invoke_agent(agent_executor, FAILING_QUESTION, tracing_config)
+
+    trace = read_trace(tracing_config)
+    assert trace["spans"][0]["error"].startswith("ToolException")
+    [tool_span] = [span for span in trace["spans"] if span["kind"] == "tool"]
+    assert tool_span["error"].startswith("ToolException")
+    assert len(list(tracing_config.profiles_dir.glob("*.prof"))) == 1
+    assert "aws_chatbot_span_errors_total" in tracing_config.metrics_path.read_text()
+
+
+def test_profile_written_after_turn_ends(agent_executor, tmp_path, monkeypatch):
+    tracing_config = TracingConfig(output_dir=tmp_path, profiler=ProfilerType.CPROFILE)
+    traces_at_dump = []
+    monkeypatch.setattr(
+        "cProfile.Profile.dump_stats",
+        lambda profiler, path: traces_at_dump.append(get_current_trace()),
+    )
+
+    invoke_agent(agent_executor, LIST_BUCKETS_QUESTION, tracing_config)
+
+    # The turn is closed before the profile is written, so writing it is not
+    # part of the turn's duration.
+    assert traces_at_dump == [None]
+    assert read_trace(tracing_config)["spans"][0]["duration_ms"] is not None
+
+
+def test_profile_write_error_does_not_fail_turn(
+    agent_executor, tmp_path, monkeypatch, caplog
+):
+    tracing_config = TracingConfig(output_dir=tmp_path, profiler=ProfilerType.CPROFILE)
+
+    def fail_dump_stats(profiler, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("cProfile.Profile.dump_stats", fail_dump_stats)
+
+    result = invoke_agent(agent_executor, LIST_BUCKETS_QUESTION, tracing_config)
+
+    assert result["output"]
+    assert read_trace(tracing_config)["spans"][0]["error"] is None
+    assert "Error writing profile" in caplog.text
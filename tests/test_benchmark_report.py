@@ -0,0 +1,125 @@
+import re
+from xml.etree import ElementTree
+
+import pytest
+
+from benchmarks.fixtures import (
+    FixtureScale,
+    SyntheticAwsAccount,
+    _to_xml,
+    create_replay_client_factory,
+)
+from benchmarks.run import (
+    QuestionResult,
+    _get_percentile,
+    _substitute,
+    format_report,
+)
+from lib.tracing import SpanKind, trace_turn
+from tools.common import create_aws_client
+
+
+def create_result(question: str, error: str | None = None) -> QuestionResult:
+    latency_ms = {"p50": 1.0, "p90": 2.0, "p99": 3.0, "mean": 1.5, "max": 3.0}
+    return QuestionResult(
+        question=question,
+        helper="S3Helper.count_buckets",
+        iterations=2,
+        latency_ms=latency_ms if error is None else {},
+        helper_latency_ms=latency_ms if error is None else {},
+        aws_call_count=1,
+        aws_calls_by_operation={"s3.ListBuckets": 1},
+        aws_response_bytes=2048,
+        turn_peak_memory_bytes=1024**2,
+        helper_peak_memory_bytes=1024,
+        error=error,
+    )
+
+
+def test_format_report_error_row():
+    report = format_report(
+        [
+            create_result("How many S3 buckets are there?"),
+            create_result(
+                "How many S3 buckets are exposed to the public?",
+                error="ParamValidationError: Parameter validation failed:\nInvalid bucket name",
+            ),
+        ]
+    )
+
+    header, _, ok_row, error_row, error_line = report.splitlines()
+    error_cells = re.split(r"\s{2,}", error_row)
+    assert len(error_cells) == len(re.split(r"\s{2,}", header))
+    assert error_cells[1:-1] == ["-"] * (len(error_cells) - 2)
+    assert error_cells[-1] == "How many S3 buckets are exposed to the public?"
+    # The error does not widen any column.
+    assert ok_row.index("How many") == error_row.index("How many")
+    assert error_line == (
+        "  error: ParamValidationError: Parameter validation failed: Invalid bucket name"
+    )
+
+
+@pytest.mark.parametrize(
+    "percentile, expected",
+    [(50, 5.0), (90, 9.0), (99, 10.0), (100, 10.0), (0, 1.0)],
+)
+def test_get_percentile_nearest_rank(percentile, expected):
+    assert _get_percentile([float(value) for value in range(1, 11)], percentile) == (
+        expected
+    )
+
+
+def test_substitute_nested_values():
+    value = {"name": "$instance_name", "tags": ["${bucket_name}-x"], "limit": None}
+
+    assert _substitute(value, {"instance_name": "i", "bucket_name": "b"}) == {
+        "name": "i",
+        "tags": ["b-x"],
+        "limit": None,
+    }
+
+    with pytest.raises(KeyError):
+        _substitute("$missing", {})
+
+
+def test_replay_response_bodies_use_service_protocol():
+    account = SyntheticAwsAccount(
+        FixtureScale(bucket_count=2, instance_count=1, cost_days=1)
+    )
+    client_factory = create_replay_client_factory(account)
+    s3_client = create_aws_client("s3", client_factory=client_factory)
+    ce_client = create_aws_client("ce", client_factory=client_factory)
+
+    with trace_turn(question="question") as trace:
+        buckets = s3_client.list_buckets()["Buckets"]
+        policy = s3_client.get_bucket_policy(Bucket=buckets[0]["Name"])["Policy"]
+        ce_client.get_cost_and_usage(
+            TimePeriod={
+                "Start": account.scale.cost_start_date.isoformat(),
+                "End": account.scale.cost_end_date.isoformat(),
+            },
+            Granularity="DAILY",
+            Metrics=["UnblendedCost"],
+        )
+
+    list_span, policy_span, cost_span = [
+        span for span in trace.spans if span.kind == SpanKind.AWS_API
+    ]
+    assert len(buckets) == 2
+    assert list_span.attributes["response_bytes"] > 0
+    # The bucket policy is the payload, so the body is the policy document.
+    assert policy_span.attributes["response_bytes"] == len(policy.encode("utf-8"))
+    assert cost_span.attributes["response_bytes"] > 0
+
+
+def test_to_xml_list_wrapping():
+    value = {"Buckets": [{"Name": "a"}, {"Name": "b&c"}]}
+
+    flattened = ElementTree.fromstring(_to_xml("R", value, None))
+    assert [element.findtext("Name") for element in flattened] == ["a", "b&c"]
+
+    wrapped = ElementTree.fromstring(_to_xml("R", value, "member"))
+    assert [element.findtext("Name") for element in wrapped.find("Buckets")] == [
+        "a",
+        "b&c",
+    ]
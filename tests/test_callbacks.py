@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import LLMResult
+
+from lib.tracing import SpanKind, TurnTrace
+from tools.callbacks import FORMAT_TOOL_OUTPUTS_RUN_NAME, TracingCallbackHandler
+
+
+@dataclass
+class ToolOutput:
+    name: str
+
+
+def test_spans_follow_run_hierarchy():
+    trace = TurnTrace.start(question="question")
+    handler = TracingCallbackHandler(trace)
+    chain_run_id, llm_run_id, tool_run_id = uuid4(), uuid4(), uuid4()
+
+    handler.on_chain_start({}, {}, run_id=chain_run_id, name="AgentExecutor")
+    handler.on_chat_model_start(
+        {"kwargs": {"model_name": "gpt"}},
+        [[AIMessage(content="a"), AIMessage(content="b")]],
+        run_id=llm_run_id,
+        parent_run_id=chain_run_id,
+    )
+    handler.on_llm_end(
+        LLMResult(generations=[], llm_output={"token_usage": {"total_tokens": 7}}),
+        run_id=llm_run_id,
+    )
+    handler.on_tool_start(
+        {"name": "AwsS3"}, "input", run_id=tool_run_id, parent_run_id=chain_run_id
+    )
+    aws_span = trace.start_span(SpanKind.AWS_API, "s3.ListBuckets")
+    trace.end_span(aws_span)
+    handler.on_tool_end([ToolOutput(name="bucket")], run_id=tool_run_id)
+    handler.on_chain_end({}, run_id=chain_run_id)
+
+    chain_span, llm_span, tool_span, _ = trace.spans[1:]
+    assert chain_span.parent_id == trace.root.span_id
+    assert (llm_span.kind, llm_span.name) == (SpanKind.LLM, "gpt")
+    assert llm_span.parent_id == chain_span.span_id
+    assert llm_span.attributes == {"message_count": 2, "total_tokens": 7}
+    assert (tool_span.kind, tool_span.name) == (SpanKind.TOOL, "AwsS3")
+    assert tool_span.parent_id == chain_span.span_id
+    # AWS calls made while the tool runs are nested under the tool span.
+    assert aws_span.parent_id == tool_span.span_id
+    assert all(span.duration_ms is not None for span in trace.spans[1:])
+
+
+def test_tool_output_bytes_use_serialized_output():
+    trace = TurnTrace.start(question="question")
+    handler = TracingCallbackHandler(trace)
+    json_run_id, str_run_id = uuid4(), uuid4()
+
+    handler.on_tool_start({"name": "AwsS3"}, "", run_id=json_run_id)
+    handler.on_tool_end({"count": 3}, run_id=json_run_id)
+    handler.on_tool_start({"name": "AwsS3"}, "", run_id=str_run_id)
+    handler.on_tool_end(ToolOutput(name="bucket"), run_id=str_run_id)
+
+    json_span, str_span = trace.spans[1:]
+    assert json_span.attributes["output_bytes"] == len('{"count": 3}')
+    assert str_span.attributes["output_bytes"] == len("ToolOutput(name='bucket')")
+
+
+def test_format_tool_outputs_span_records_output_bytes():
+    trace = TurnTrace.start(question="question")
+    handler = TracingCallbackHandler(trace)
+    run_id = uuid4()
+
+    handler.on_chain_start({}, {}, run_id=run_id, name=FORMAT_TOOL_OUTPUTS_RUN_NAME)
+    handler.on_chain_end(
+        [AIMessage(content=""), ToolMessage(content="12345", tool_call_id="call")],
+        run_id=run_id,
+    )
+
+    span = trace.spans[1]
+    assert span.attributes == {"tool_message_count": 1, "output_bytes": 5}
+
+
+def test_errors_are_recorded():
+    trace = TurnTrace.start(question="question")
+    handler = TracingCallbackHandler(trace)
+    run_id = uuid4()
+
+    handler.on_tool_start({"name": "AwsS3"}, "", run_id=run_id)
+    handler.on_tool_error(ValueError("failed"), run_id=run_id)
+
+    assert trace.spans[1].error == "ValueError: failed"
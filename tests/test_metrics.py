@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.metrics import MetricsRegistry
+from lib.tracing import SpanKind, TurnTrace
+
+
+def create_trace() -> TurnTrace:
+    trace = TurnTrace.start(question="question")
+    trace.root.duration_ms = 2000
+    tool_span = trace.start_span(SpanKind.TOOL, 'Aws"S3\\')
+    tool_span.duration_ms = 100
+    aws_span = trace.start_span(
+        SpanKind.AWS_API,
+        "s3.ListBuckets",
+        attributes={
+            "service": "s3",
+            "operation": "ListBuckets",
+            "request_bytes": 10,
+            "response_bytes": 200,
+        },
+    )
+    aws_span.duration_ms = 5
+    aws_span.error = "ClientError: failed"
+
+    return trace
+
+
+def test_render_histogram_buckets():
+    registry = MetricsRegistry(latency_buckets_seconds=(0.005, 0.1, 1.0))
+    registry.observe_trace(create_trace())
+    registry.observe_trace(create_trace())
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE aws_chatbot_span_duration_seconds histogram" in lines
+    prefix = (
+        'aws_chatbot_span_duration_seconds_bucket{kind="aws_api",name="s3.ListBuckets"'
+    )
+    # Observations equal to a bucket bound fall into that bucket.
+    assert f'{prefix},le="0.005"}} 2' in lines
+    assert f'{prefix},le="1.0"}} 2' in lines
+    assert f'{prefix},le="+Inf"}} 2' in lines
+    turn_prefix = 'aws_chatbot_span_duration_seconds_bucket{kind="turn",name="turn"'
+    assert f'{turn_prefix},le="1.0"}} 0' in lines
+    assert f'{turn_prefix},le="+Inf"}} 2' in lines
+    assert 'aws_chatbot_span_duration_seconds_sum{kind="turn",name="turn"} 4.0' in lines
+    assert 'aws_chatbot_span_duration_seconds_count{kind="turn",name="turn"} 2' in lines
+
+
+def test_render_errors_and_aws_bytes():
+    registry = MetricsRegistry()
+    registry.observe_trace(create_trace())
+
+    lines = registry.render().splitlines()
+
+    assert (
+        'aws_chatbot_span_errors_total{kind="aws_api",name="s3.ListBuckets"} 1' in lines
+    )
+    assert (
+        'aws_chatbot_aws_api_bytes_total{service="s3",operation="ListBuckets",direction="request"} 10'
+        in lines
+    )
+    assert (
+        'aws_chatbot_aws_api_bytes_total{service="s3",operation="ListBuckets",direction="response"} 200'
+        in lines
+    )
+
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.observe_trace(create_trace())
+
+    assert (
+        'aws_chatbot_span_duration_seconds_count{kind="tool",name="Aws\\"S3\\\\"} 1'
+        in registry.render().splitlines()
+    )
+
+
+def test_write(tmp_path):
+    registry = MetricsRegistry()
+    registry.observe_trace(create_trace())
+    metrics_path = tmp_path / "metrics" / "metrics.prom"
+
+    registry.write(metrics_path)
+
+    assert metrics_path.read_text() == registry.render()
+    assert list(metrics_path.parent.iterdir()) == [metrics_path]
+
+
+def test_concurrent_writes(tmp_path):
+    registry = MetricsRegistry()
+    registry.observe_trace(create_trace())
+    metrics_path = tmp_path / "metrics.prom"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # Raises if a write fails, e.g. when another thread renamed the file.
+        list(executor.map(lambda _: registry.write(metrics_path), range(200)))
+
+    assert metrics_path.read_text() == registry.render()
+    assert list(tmp_path.iterdir()) == [metrics_path]
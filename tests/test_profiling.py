@@ -0,0 +1,30 @@
+import pstats
+
+from lib.profiling import ProfilerType, profile
+
+
+def test_profile_writes_cprofile_stats(tmp_path):
+    with profile(ProfilerType.CPROFILE, tmp_path / "profiles" / "turn") as path:
+        sum(range(100))
+
+    assert path == tmp_path / "profiles" / "turn.prof"
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_profile_disabled_without_profiler_type(tmp_path):
+    with profile(None, tmp_path / "turn") as path:
+        pass
+
+    assert path is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile_directory_error_disables_profiling(tmp_path, caplog):
+    # A file where the profile directory should be makes mkdir fail.
+    (tmp_path / "profiles").write_text("")
+
+    with profile(ProfilerType.CPROFILE, tmp_path / "profiles" / "turn") as path:
+        pass
+
+    assert path is None
+    assert "profiling disabled" in caplog.text
@@ -0,0 +1,237 @@
+from io import BytesIO
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError, ParamValidationError
+from botocore.stub import Stubber
+from urllib3.response import HTTPResponse
+
+from lib.profiling import ProfilerType
+from lib.tracing import (
+    SpanKind,
+    TracingConfig,
+    TurnTrace,
+    get_current_trace,
+    instrument_aws_client,
+    trace_turn,
+)
+from tools.common import create_aws_client
+
+
+def create_s3_client():
+    return instrument_aws_client(
+        boto3.client(
+            "s3",
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+    )
+
+
+def respond_with_body(client, body: bytes, parsed: dict) -> None:
+    def before_call(**_):
+        # No content-length header, as with chunked transfer encoding.
+        http_response = AWSResponse(
+            url="https://s3.amazonaws.com/",
+            status_code=200,
+            headers={},
+            raw=HTTPResponse(body=BytesIO(body), preload_content=False),
+        )
+        return http_response, parsed
+
+    client.meta.events.register_last("before-call.s3.*", before_call)
+
+
+def get_aws_api_spans(trace: TurnTrace):
+    return [span for span in trace.spans if span.kind == SpanKind.AWS_API]
+
+
+def test_start_span_parents_under_innermost_active_span():
+    trace = TurnTrace.start(question="question")
+
+    tool_span = trace.start_span(SpanKind.TOOL, "tool", activate=True)
+    aws_span = trace.start_span(SpanKind.AWS_API, "s3.ListBuckets")
+    trace.end_span(aws_span)
+    trace.end_span(tool_span)
+    llm_span = trace.start_span(SpanKind.LLM, "llm")
+
+    assert tool_span.parent_id == trace.root.span_id
+    assert aws_span.parent_id == tool_span.span_id
+    assert llm_span.parent_id == trace.root.span_id
+
+
+def test_start_span_uses_explicit_parent():
+    trace = TurnTrace.start(question="question")
+    chain_span = trace.start_span(SpanKind.CHAIN, "chain")
+    trace.start_span(SpanKind.TOOL, "other", activate=True)
+
+    llm_span = trace.start_span(SpanKind.LLM, "llm", parent=chain_span)
+
+    assert llm_span.parent_id == chain_span.span_id
+
+
+def test_end_span_out_of_order_deactivates_only_that_span():
+    trace = TurnTrace.start(question="question")
+    outer_span = trace.start_span(SpanKind.CHAIN, "outer", activate=True)
+    inner_span = trace.start_span(SpanKind.TOOL, "inner", activate=True)
+
+    trace.end_span(outer_span)
+    child_span = trace.start_span(SpanKind.AWS_API, "child")
+    trace.end_span(inner_span)
+    sibling_span = trace.start_span(SpanKind.AWS_API, "sibling")
+
+    assert outer_span.duration_ms is not None
+    assert child_span.parent_id == inner_span.span_id
+    assert sibling_span.parent_id == trace.root.span_id
+
+
+def test_summary_reports_self_durations():
+    trace = TurnTrace.start(question="question")
+    chain_span = trace.start_span(SpanKind.CHAIN, "chain", activate=True)
+    tool_span = trace.start_span(SpanKind.TOOL, "tool", activate=True)
+    aws_span = trace.start_span(
+        SpanKind.AWS_API,
+        "s3.ListBuckets",
+        attributes={"request_bytes": 10, "response_bytes": 100},
+    )
+    trace.root.duration_ms = 100
+    chain_span.duration_ms = 90
+    tool_span.duration_ms = 60
+    aws_span.duration_ms = 40
+
+    summary = trace.summary()
+
+    assert summary["turn_self_duration_ms"] == 10
+    assert summary["chain_self_duration_ms"] == 30
+    assert summary["tool_self_duration_ms"] == 20
+    assert summary["aws_api_self_duration_ms"] == 40
+    assert summary["tool_count"] == 1
+    assert summary["aws_request_bytes"] == 10
+    assert summary["aws_response_bytes"] == 100
+
+
+def test_trace_turn_sets_current_trace_and_records_errors():
+    with pytest.raises(RuntimeError):
+        with trace_turn(question="question", trace_id="trace-id") as trace:
+            assert get_current_trace() is trace
+            raise RuntimeError("failed")
+
+    assert get_current_trace() is None
+    assert trace.trace_id == "trace-id"
+    assert trace.root.duration_ms is not None
+    assert trace.root.error == "RuntimeError: failed"
+
+
+def test_aws_api_span_records_call():
+    client = create_s3_client()
+    body = b"<ListAllMyBucketsResult></ListAllMyBucketsResult>"
+    respond_with_body(client, body, {"Buckets": [], "ResponseMetadata": {}})
+
+    with trace_turn(question="question") as trace:
+        with trace.span(SpanKind.TOOL, "AwsS3") as tool_span:
+            client.list_buckets()
+
+    [span] = get_aws_api_spans(trace)
+    assert span.name == "s3.ListBuckets"
+    assert span.parent_id == tool_span.span_id
+    assert span.duration_ms is not None
+    assert span.error is None
+    assert span.attributes["status_code"] == 200
+    assert span.attributes["response_bytes"] == len(body)
+    assert span.attributes["request_bytes"] == 0
+
+
+def test_aws_api_span_records_client_error():
+    client = create_s3_client()
+    stubber = Stubber(client)
+    stubber.add_client_error(
+        "get_bucket_policy", "NoSuchBucketPolicy", http_status_code=404
+    )
+
+    with stubber, trace_turn(question="question") as trace:
+        with pytest.raises(ClientError):
+            client.get_bucket_policy(Bucket="bucket")
+
+    [span] = get_aws_api_spans(trace)
+    assert span.duration_ms is not None
+    assert "NoSuchBucketPolicy" in span.error
+    assert span.attributes["status_code"] == 404
+
+
+def test_aws_api_span_closed_on_validation_error():
+    client = create_s3_client()
+
+    with trace_turn(question="question") as trace:
+        with pytest.raises(ParamValidationError):
+            client.list_objects_v2(Bucket="bad bucket name!")
+
+    [span] = get_aws_api_spans(trace)
+    assert span.duration_ms is not None
+    assert span.error.startswith("ParamValidationError")
+
+
+def test_instrumenting_client_twice_records_one_span_per_call():
+    client = instrument_aws_client(create_s3_client())
+    respond_with_body(client, b"", {"Buckets": [], "ResponseMetadata": {}})
+
+    with trace_turn(question="question") as trace:
+        client.list_buckets()
+        client.list_buckets()
+
+    assert [span.name for span in get_aws_api_spans(trace)] == [
+        "s3.ListBuckets",
+        "s3.ListBuckets",
+    ]
+
+
+def test_client_creation_traced_apart_from_aws_api_calls():
+    client = create_s3_client()
+    respond_with_body(client, b"", {"Buckets": [], "ResponseMetadata": {}})
+
+    with trace_turn(question="question") as trace:
+        with trace.span(SpanKind.TOOL, "aws_s3") as tool_span:
+            create_aws_client("s3", client_factory=lambda _: client).list_buckets()
+
+    client_span, aws_api_span = trace.spans[2:]
+    assert client_span.kind == SpanKind.AWS_CLIENT
+    assert client_span.name == "s3.create_client"
+    assert client_span.parent_id == tool_span.span_id
+    assert client_span.duration_ms is not None
+    assert aws_api_span.parent_id == tool_span.span_id
+    assert trace.summary()["aws_client_count"] == 1
+
+
+def test_aws_api_calls_outside_trace_are_not_recorded(monkeypatch):
+    client = create_s3_client()
+    respond_with_body(client, b"", {"Buckets": [], "ResponseMetadata": {}})
+    started_spans = []
+    start_span = TurnTrace.start_span
+
+    def record_start_span(*args, **kwargs):
+        span = start_span(*args, **kwargs)
+        started_spans.append(span)
+        return span
+
+    monkeypatch.setattr(TurnTrace, "start_span", record_start_span)
+
+    assert client.list_buckets()["Buckets"] == []
+
+    assert get_current_trace() is None
+    assert started_spans == []
+    with trace_turn(question="question") as trace:
+        pass
+    assert get_aws_api_spans(trace) == []
+
+
+def test_tracing_config_from_env(monkeypatch):
+    monkeypatch.delenv("TRACE_OUTPUT_DIR", raising=False)
+    assert TracingConfig.from_env() is None
+
+    monkeypatch.setenv("TRACE_OUTPUT_DIR", "traces")
+    monkeypatch.setenv("TRACE_PROFILER", "cProfile")
+    assert TracingConfig.from_env().profiler == ProfilerType.CPROFILE
+
+    monkeypatch.setenv("TRACE_PROFILER", "cProfiler")
+    assert TracingConfig.from_env().profiler is None
@@ -1,6 +1,5 @@
 from typing import Type
 
-import boto3
 from langchain_core.tools import ToolException
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
@@ -10,7 +9,11 @@ from langchain.callbacks.manager import (
 )
 
 from lib.cost_explorer_helper import CostExplorerHelper
-from tools.common import get_tool_error_string
+from tools.common import (
+    AwsClientFactory,
+    create_aws_client,
+    get_tool_error_string,
+)
 
 
 class AwsCostExplorerDescribeCostAndUsageOperation(BaseModel):
@@ -32,6 +35,7 @@ class AwsCostExplorerTool(BaseTool):
     name: str = "AwsCostExplorer"
     description: str = "Determine information about AWS costs"
     args_schema: Type[BaseModel] = AwsCostExplorerQueryInput
+    aws_client_factory: AwsClientFactory | None = None
 
     def _run(
         self,
@@ -39,7 +43,11 @@ class AwsCostExplorerTool(BaseTool):
         run_manager: CallbackManagerForToolRun | None = None,
     ):
         try:
-            ce_helper = CostExplorerHelper(ce_client=boto3.client("ce"))
+            ce_helper = CostExplorerHelper(
+                ce_client=create_aws_client(
+                    "ce", client_factory=self.aws_client_factory
+                )
+            )
             if isinstance(operation, AwsCostExplorerDescribeCostAndUsageOperation):
                 return ce_helper.get_usd_costs_for_all_services(
                     start_date=operation.start_date, end_date=operation.end_date
@@ -47,7 +55,11 @@ class AwsCostExplorerTool(BaseTool):
 
             raise ValueError("Unexpected AWS Cost Explorer operation")
         except Exception as exc:
-            raise ToolException(get_tool_error_string(tool_operation='querying AWS Cost Explorer information')) from exc
+            raise ToolException(
+                get_tool_error_string(
+                    tool_operation="querying AWS Cost Explorer information"
+                )
+            ) from exc
 
     def _arun(
         self,
@@ -1,6 +1,5 @@
 from typing import Literal, Type
 
-import boto3
 from langchain_core.tools import ToolException
 from langchain.pydantic_v1 import BaseModel, Field, root_validator
 from langchain.tools import BaseTool
@@ -10,7 +9,11 @@ from langchain.callbacks.manager import (
 )
 
 from lib.ec2_helper import Ec2Helper
-from tools.common import get_tool_error_string
+from tools.common import (
+    AwsClientFactory,
+    create_aws_client,
+    get_tool_error_string,
+)
 
 
 class AwsEc2DescribeInstanceOperation(BaseModel):
@@ -47,6 +50,7 @@ class AwsEc2Tool(BaseTool):
     name = "AwsEc2"
     description = "Determine information about AWS EC2 instances"
     args_schema: Type[BaseModel] = AwsEc2QueryInput
+    aws_client_factory: AwsClientFactory | None = None
 
     def _run(
         self,
@@ -54,7 +58,11 @@ class AwsEc2Tool(BaseTool):
         run_manager: CallbackManagerForToolRun | None = None,
     ):
         try:
-            ec2_helper = Ec2Helper(ec2_client=boto3.client("ec2"))
+            ec2_helper = Ec2Helper(
+                ec2_client=create_aws_client(
+                    "ec2", client_factory=self.aws_client_factory
+                )
+            )
             if isinstance(operation, AwsEc2DescribeInstanceOperation):
                 return ec2_helper.describe_instance(
                     name=operation.instance_name, ipv4_address=operation.ipv4_address
@@ -1,6 +1,5 @@
 from typing import Literal, Optional, Type
 
-import boto3
 from langchain_core.tools import ToolException
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
@@ -10,7 +9,11 @@ from langchain.callbacks.manager import (
 )
 
 from lib.iam_helper import IamHelper
-from tools.common import get_tool_error_string
+from tools.common import (
+    AwsClientFactory,
+    create_aws_client,
+    get_tool_error_string,
+)
 
 
 class AwsIamDescribeUserPermissionsOperation(BaseModel):
@@ -29,6 +32,7 @@ class AwsIamTool(BaseTool):
     name = "AwsIam"
     description = "Determine information about AWS IAM users"
     args_schema: Type[BaseModel] = AwsIamQueryInput
+    aws_client_factory: AwsClientFactory | None = None
 
     def _run(
         self,
@@ -36,7 +40,11 @@ class AwsIamTool(BaseTool):
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ):
         try:
-            iam_helper = IamHelper(iam_client=boto3.client("iam"))
+            iam_helper = IamHelper(
+                iam_client=create_aws_client(
+                    "iam", client_factory=self.aws_client_factory
+                )
+            )
             if isinstance(operation, AwsIamDescribeUserPermissionsOperation):
                 return iam_helper.get_user_permissions(username=operation.username)
         except Exception as exc:
@@ -1,6 +1,5 @@
 from typing import Literal, Optional, Type
 
-import boto3
 from langchain_core.tools import ToolException
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import BaseTool
@@ -10,7 +9,11 @@ from langchain.callbacks.manager import (
 )
 
 from lib.s3_helper import S3Helper
-from tools.common import get_tool_error_string
+from tools.common import (
+    AwsClientFactory,
+    create_aws_client,
+    get_tool_error_string,
+)
 
 
 class AwsS3ListBucketsOperation(BaseModel):
@@ -46,6 +49,7 @@ class AwsS3Tool(BaseTool):
     name = "AwsS3"
     description = "Determine information about AWS S3 buckets"
     args_schema: Type[BaseModel] = AwsS3QueryInput
+    aws_client_factory: AwsClientFactory | None = None
 
     def _run(
         self,
@@ -53,7 +57,11 @@ class AwsS3Tool(BaseTool):
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ):
         try:
-            s3_helper = S3Helper(s3_client=boto3.client("s3"))
+            s3_helper = S3Helper(
+                s3_client=create_aws_client(
+                    "s3", client_factory=self.aws_client_factory
+                )
+            )
             if isinstance(operation, AwsS3ListBucketsOperation):
                 return s3_helper.list_buckets()
             elif isinstance(operation, AwsS3CountBucketsOperation):
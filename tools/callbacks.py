@@ -0,0 +1,187 @@
+import json
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.outputs import LLMResult
+
+from lib.tracing import Span, SpanKind, TurnTrace
+
+# Run name of the agent step that serializes tool outputs into messages.
+FORMAT_TOOL_OUTPUTS_RUN_NAME = "FormatToolOutputs"
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records chain, LLM and tool runs of an agent turn as spans of ``trace``.
+
+    Chain spans cover the agent's own work between LLM and tool calls, such as
+    formatting tool outputs into the scratchpad and parsing LLM responses.
+    """
+
+    def __init__(self, trace: TurnTrace) -> None:
+        self._trace = trace
+        self._spans_by_run_id: dict[UUID, Span] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name") or _get_serialized_name(serialized, "chain")
+        self._start_span(SpanKind.CHAIN, name, run_id, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans_by_run_id.get(run_id)
+        if (
+            span is not None
+            and span.name == FORMAT_TOOL_OUTPUTS_RUN_NAME
+            and isinstance(outputs, list)
+        ):
+            tool_messages = [
+                message for message in outputs if isinstance(message, ToolMessage)
+            ]
+            span.attributes["tool_message_count"] = len(tool_messages)
+            span.attributes["output_bytes"] = sum(
+                len(str(message.content).encode("utf-8")) for message in tool_messages
+            )
+
+        self._end_span(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_span(run_id, error=error)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        span = self._start_span(
+            SpanKind.LLM, _get_model_name(serialized), run_id, parent_run_id
+        )
+        span.attributes["message_count"] = sum(len(batch) for batch in messages)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        span = self._start_span(
+            SpanKind.LLM, _get_model_name(serialized), run_id, parent_run_id
+        )
+        span.attributes["prompt_count"] = len(prompts)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans_by_run_id.get(run_id)
+        if span is not None:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            for key in ["prompt_tokens", "completion_tokens", "total_tokens"]:
+                if key in token_usage:
+                    span.attributes[key] = token_usage[key]
+
+        self._end_span(run_id)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_span(run_id, error=error)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        span = self._start_span(
+            SpanKind.TOOL,
+            _get_serialized_name(serialized, "tool"),
+            run_id,
+            parent_run_id,
+            # AWS API calls made by the tool are nested under its span.
+            activate=True,
+        )
+        span.attributes["input_bytes"] = len(input_str.encode("utf-8"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans_by_run_id.get(run_id)
+        if span is not None:
+            span.attributes["output_type"] = type(output).__name__
+            span.attributes["output_bytes"] = len(
+                _serialize_tool_output(output).encode("utf-8")
+            )
+
+        self._end_span(run_id)
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_span(run_id, error=error)
+
+    def _start_span(
+        self,
+        kind: SpanKind,
+        name: str,
+        run_id: UUID,
+        parent_run_id: UUID | None,
+        activate: bool = False,
+    ) -> Span:
+        parent = (
+            self._spans_by_run_id.get(parent_run_id)
+            if parent_run_id is not None
+            else None
+        )
+        span = self._trace.start_span(
+            kind=kind, name=name, parent=parent, activate=activate
+        )
+        self._spans_by_run_id[run_id] = span
+
+        return span
+
+    def _end_span(self, run_id: UUID, error: BaseException | None = None) -> None:
+        span = self._spans_by_run_id.pop(run_id, None)
+        if span is not None:
+            self._trace.end_span(span, error=error)
+
+
+def _get_serialized_name(serialized: dict[str, Any] | None, default: str) -> str:
+    if not serialized:
+        return default
+
+    if serialized.get("name"):
+        return serialized["name"]
+
+    return (serialized.get("id") or [default])[-1]
+
+
+def _get_model_name(serialized: dict[str, Any] | None) -> str:
+    model_name = ((serialized or {}).get("kwargs") or {}).get("model_name")
+    return model_name or _get_serialized_name(serialized, "llm")
+
+
+def _serialize_tool_output(output: Any) -> str:
+    # Mirrors how the OpenAI tools agent turns a tool output into message
+    # content. This repeats that serialization, but only for traced turns.
+    if isinstance(output, str):
+        return output
+
+    try:
+        return json.dumps(output, ensure_ascii=False)
+    except Exception:
+        return str(output)
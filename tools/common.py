@@ -1,2 +1,32 @@
+from typing import Callable
+
+import boto3
+from botocore.client import BaseClient
+
+from lib.tracing import SpanKind, get_current_trace, instrument_aws_client
+
+AwsClientFactory = Callable[[str], BaseClient]
+
+
 def get_tool_error_string(tool_operation: str) -> str:
     return f"Apologies, ran into an error when {tool_operation}. Please try again."
+
+
+def create_aws_client(
+    service_name: str, client_factory: AwsClientFactory | None = None
+) -> BaseClient:
+    if client_factory is None:
+        client_factory = boto3.client
+
+    trace = get_current_trace()
+    if trace is None:
+        return instrument_aws_client(client_factory(service_name))
+
+    # Tools create a client per call, so its cost is traced apart from the
+    # tool's own work.
+    with trace.span(
+        SpanKind.AWS_CLIENT, f"{service_name}.create_client", service=service_name
+    ):
+        client = client_factory(service_name)
+
+    return instrument_aws_client(client)